@@ -4,15 +4,74 @@ Adobe India Hackathon 2025 - Challenge 1a: PDF Processing Solution
 Main processing script that handles all PDFs in the input directory.
 """
 
+import contextlib
+import io
 import os
 import sys
-import json
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List
 
 # Import our PDF extractor
-from src.main_improved import ImprovedPDFExtractor
+from src.main_improved import ImprovedPDFExtractor, LANGUAGE_CACHE_PATH, write_json_output
+
+
+# One extractor per worker process, created on first use and reused across PDFs
+_extractor = None
+
+
+def process_one_pdf(pdf_file: Path, output_dir: Path) -> str:
+    """
+    Process a single PDF and write its JSON output.
+    Runs inside a worker process; returns the report to print for this file,
+    including anything the extractor printed while processing it.
+    """
+    global _extractor
+    if _extractor is None:
+        _extractor = ImprovedPDFExtractor(language_cache_path=LANGUAGE_CACHE_PATH)
+    
+    report = [f"\nProcessing: {pdf_file.name}"]
+    
+    # Generate output filename
+    output_file = output_dir / f"{pdf_file.stem}.json"
+    
+    extractor_output = io.StringIO()
+    
+    try:
+        # Process the PDF (the extractor's prints are kept with this file's report)
+        start_time = time.time()
+        with contextlib.redirect_stdout(extractor_output):
+            result = _extractor.process_pdf_enhanced(str(pdf_file))
+        processing_time = time.time() - start_time
+        
+        # Write JSON output
+        write_json_output(output_file, result)
+        
+        report.append(f"✅ Successfully processed {pdf_file.name}")
+        report.append(f"   - Title: {result['title']}")
+        report.append(f"   - Headings found: {len(result['outline'])}")
+        report.append(f"   - Processing time: {processing_time:.2f}s")
+        report.append(f"   - Output: {output_file.name}")
+        
+        # Performance check
+        if processing_time > 10.0:
+            report.append(f"   ⚠️  WARNING: Processing time ({processing_time:.2f}s) exceeds 10-second limit!")
+        else:
+            report.append(f"   ✅ Processing time ({processing_time:.2f}s) meets requirement!")
+            
+    except Exception as e:
+        report.append(f"❌ Error processing {pdf_file.name}: {e}")
+        # Create error output with empty structure
+        error_result = {
+            "title": f"Error processing {pdf_file.name}",
+            "outline": []
+        }
+        write_json_output(output_file, error_result)
+    
+    # Extractor messages go right under the file name
+    report[1:1] = [f"   {line}" for line in extractor_output.getvalue().splitlines()]
+    return "\n".join(report)
 
 
 def process_pdfs():
@@ -26,9 +85,6 @@ def process_pdfs():
     # Ensure output directory exists
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Initialize the PDF extractor
-    extractor = ImprovedPDFExtractor()
-    
     # Get all PDF files from input directory
     pdf_files = list(input_dir.glob("*.pdf"))
     
@@ -40,45 +96,11 @@ def process_pdfs():
     
     total_start_time = time.time()
     
-    # Process each PDF file
-    for pdf_file in pdf_files:
-        print(f"\nProcessing: {pdf_file.name}")
-        
-        try:
-            # Generate output filename
-            output_file = output_dir / f"{pdf_file.stem}.json"
-            
-            # Process the PDF
-            start_time = time.time()
-            result = extractor.process_pdf_enhanced(str(pdf_file))
-            processing_time = time.time() - start_time
-            
-            # Write JSON output
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(result, f, indent=2, ensure_ascii=False)
-            
-            print(f"✅ Successfully processed {pdf_file.name}")
-            print(f"   - Title: {result['title']}")
-            print(f"   - Headings found: {len(result['outline'])}")
-            print(f"   - Processing time: {processing_time:.2f}s")
-            print(f"   - Output: {output_file.name}")
-            
-            # Performance check
-            if processing_time > 10.0:
-                print(f"   ⚠️  WARNING: Processing time ({processing_time:.2f}s) exceeds 10-second limit!")
-            else:
-                print(f"   ✅ Processing time ({processing_time:.2f}s) meets requirement!")
-                
-        except Exception as e:
-            print(f"❌ Error processing {pdf_file.name}: {e}")
-            # Create error output with empty structure
-            error_result = {
-                "title": f"Error processing {pdf_file.name}",
-                "outline": []
-            }
-            output_file = output_dir / f"{pdf_file.stem}.json"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(error_result, f, indent=2, ensure_ascii=False)
+    # Process PDFs in parallel; each file is independent. Reports come back in input order.
+    workers = min(len(pdf_files), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for report in executor.map(process_one_pdf, pdf_files, [output_dir] * len(pdf_files)):
+            print(report)
     
     total_time = time.time() - total_start_time
     print(f"\n🎉 Processing complete!")
@@ -0,0 +1,74 @@
+"""
+Numeric kernels for heading detection, vectorized with NumPy.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+# Font size tiers of the heading score: (size relative to the document average, points)
+SIZE_TIER_RATIOS = (1.5, 1.3, 1.1, 0.9)
+SIZE_TIER_POINTS = (35, 30, 25, 15)
+SIZE_TIER_DEFAULT_POINTS = 5
+
+
+def _size_threshold(ratio: float, avg_font_size: float) -> float:
+    """Smallest font size with font_size / avg_font_size >= ratio.
+
+    Comparing sizes against this gives exactly the same tiers as dividing
+    every size by the average, including sizes that sit on a tier boundary.
+    """
+    threshold = ratio * avg_font_size
+    while threshold / avg_font_size < ratio:
+        threshold = np.nextafter(threshold, np.inf)
+    while np.nextafter(threshold, -np.inf) / avg_font_size >= ratio:
+        threshold = np.nextafter(threshold, -np.inf)
+    return float(threshold)
+
+
+def score_blocks(font_sizes: np.ndarray, is_bold: np.ndarray, x0s: np.ndarray,
+                 y0s: np.ndarray, lengths: np.ndarray, pattern_flags: np.ndarray,
+                 keyword_flags: np.ndarray, titlecase_flags: np.ndarray,
+                 avg_font_size: float) -> np.ndarray:
+    """Vectorized multi-factor heading score for a batch of text blocks."""
+    scores = np.zeros(len(font_sizes), dtype=np.int32)
+
+    # Font size scoring (relative to document); the tiers are turned into absolute
+    # thresholds once, so sizes are compared directly instead of divided one by one
+    if avg_font_size > 0:
+        scores += np.select(
+            [font_sizes >= _size_threshold(ratio, avg_font_size) for ratio in SIZE_TIER_RATIOS],
+            SIZE_TIER_POINTS,
+            default=SIZE_TIER_DEFAULT_POINTS,
+        ).astype(np.int32)
+
+    # Style scoring
+    scores += 25 * is_bold
+
+    # Position scoring (near top of page, centered)
+    scores += 15 * (y0s < 300)
+    scores += 15 * (np.abs(x0s) < 150)
+
+    # Content scoring
+    scores += 20 * titlecase_flags
+    scores += 30 * pattern_flags
+    scores += 20 * keyword_flags
+
+    # Length scoring
+    scores += 10 * ((lengths >= 5) & (lengths <= 50))
+    scores += 5 * ((lengths >= 51) & (lengths <= 80))
+
+    return scores
+
+
+def font_stats(font_sizes: np.ndarray) -> Tuple[float, float, float]:
+    """Average, 25th and 75th percentile of a non-empty font size array.
+
+    The percentiles are the same order statistics a full sort would give,
+    selected in O(N) with np.partition.
+    """
+    n = len(font_sizes)
+    low, high = n // 4, 3 * n // 4
+    partitioned = np.partition(font_sizes, (low, high))
+    return float(font_sizes.mean()), float(partitioned[low]), float(partitioned[high])
@@ -10,11 +10,21 @@ import sys
 import json
 import re
 import argparse
-from typing import List, Dict, Tuple, Optional
+import functools
+import hashlib
+from typing import Callable, List, Dict, Tuple, Optional, NamedTuple
 from dataclasses import dataclass
 from collections import defaultdict
+import statistics
 import time
 
+import numpy as np
+
+try:
+    from ._kernels import score_blocks, font_stats
+except ImportError:
+    from _kernels import score_blocks, font_stats  # running as a script from src/
+
 # Multilingual support imports
 try:
     from langdetect import detect, DetectorFactory
@@ -29,9 +39,27 @@ try:
 except ImportError:
     SPACY_AVAILABLE = False
 
+# Fast JSON output
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Multi-keyword matching support
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 try:
     import fitz  # PyMuPDF
     PDF_LIBRARY = "PyMuPDF"
+    # Text-only extraction: no image blocks, ligatures expanded to plain characters.
+    # Glyphs without a Unicode mapping still come through as their CID, as with get_text("dict").
+    TEXT_FLAGS = (fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP
+                  | fitz.TEXT_CID_FOR_UNKNOWN_UNICODE)
 except ImportError:
     try:
         import PyPDF2
@@ -44,9 +72,284 @@ except ImportError:
         sys.exit(1)
 
 
-@dataclass
+# Supported document languages, stored as small ints once detected
+LANG_EN, LANG_ES, LANG_FR, LANG_DE, LANG_JA, LANG_ZH, LANG_AR, LANG_HI = range(8)
+LANGUAGE_CODES = ('en', 'es', 'fr', 'de', 'ja', 'zh', 'ar', 'hi')
+
+# Map langdetect codes to our supported languages
+_LANGDETECT_CODES = {code: lang for lang, code in enumerate(LANGUAGE_CODES)}
+_LANGDETECT_CODES.update({'zh-cn': LANG_ZH, 'zh-tw': LANG_ZH, 'zh-hans': LANG_ZH, 'zh-hant': LANG_ZH})
+
+# Languages whose headings follow Latin-script capitalization rules
+_LATIN_LANGS = frozenset({LANG_EN, LANG_ES, LANG_FR, LANG_DE})
+
+# Multilingual numbered patterns: 1. 1) I. a) A. plus Japanese/Chinese
+# (第1章, 第1節, 第1节), Arabic and Hindi chapter/section markers.
+_NUMBERED_PATTERNS = (
+    r'\d+[.)]|[IVX]+\.|[a-z]\)|[A-Z]\.'
+    r'|第\d+[章節节]'
+    r'|الفصل\s+\d+|القسم\s+\d+'
+    r'|अध्याय\s+\d+|खंड\s+\d+'
+)
+
+# Multilingual heading prefixes
+_PREFIXES_BY_LANG = {
+    LANG_EN: ('Chapter', 'Section', 'Part', 'Introduction', 'Conclusion',
+              'Abstract', 'Summary', 'Overview', 'Background', 'Method',
+              'Results', 'Discussion', 'References', 'Appendix'),
+    LANG_ES: ('Capítulo', 'Sección', 'Parte', 'Introducción', 'Conclusión',
+              'Resumen', 'Antecedentes', 'Método', 'Resultados', 'Discusión'),
+    LANG_FR: ('Chapitre', 'Section', 'Partie', 'Introduction', 'Conclusion',
+              'Résumé', 'Contexte', 'Méthode', 'Résultats', 'Discussion'),
+    LANG_DE: ('Kapitel', 'Abschnitt', 'Teil', 'Einleitung', 'Schlussfolgerung',
+              'Zusammenfassung', 'Hintergrund', 'Methode', 'Ergebnisse'),
+    LANG_JA: ('章', '節', '部', '序論', '結論', '要約', '背景', '方法', '結果'),
+    LANG_ZH: ('章', '节', '部分', '引言', '结论', '摘要', '背景', '方法', '结果'),
+    LANG_AR: ('فصل', 'قسم', 'جزء', 'مقدمة', 'خاتمة', 'ملخص', 'خلفية', 'طريقة'),
+    LANG_HI: ('अध्याय', 'खंड', 'भाग', 'परिचय', 'निष्कर्ष', 'सारांश', 'पृष्ठभूमि'),
+}
+
+# Numbered patterns and the language's prefixes folded into one anchored
+# alternation per language, so a heading-pattern check is a single re.match.
+# This stays on the stdlib engine: RE2's \d and \s are ASCII-only (Arabic-Indic
+# and Devanagari numerals would stop matching) and its per-call overhead is
+# higher than re.match on short lines.
+_HEADING_PATTERN_RE_BY_LANG = {
+    lang: re.compile(
+        '(?:' + _NUMBERED_PATTERNS + '|' + '|'.join(re.escape(prefix) for prefix in prefixes) + ')'
+    )
+    for lang, prefixes in _PREFIXES_BY_LANG.items()
+}
+
+# Multilingual heading keywords (matched against lowercased text)
+_KEYWORDS_BY_LANG = {
+    LANG_EN: ('chapter', 'section', 'part', 'introduction', 'conclusion',
+              'abstract', 'summary', 'overview', 'background', 'method',
+              'results', 'discussion', 'references', 'appendix', 'analysis',
+              'evaluation', 'assessment', 'review', 'study', 'research',
+              'implementation', 'design', 'development', 'testing'),
+    LANG_ES: ('capítulo', 'sección', 'parte', 'introducción', 'conclusión',
+              'resumen', 'antecedentes', 'método', 'resultados', 'discusión'),
+    LANG_FR: ('chapitre', 'section', 'partie', 'introduction', 'conclusion',
+              'résumé', 'contexte', 'méthode', 'résultats', 'discussion'),
+    LANG_DE: ('kapitel', 'abschnitt', 'teil', 'einleitung', 'schlussfolgerung',
+              'zusammenfassung', 'hintergrund', 'methode', 'ergebnisse'),
+    LANG_JA: ('章', '節', '部', '序論', '結論', '要約', '背景', '方法', '結果'),
+    LANG_ZH: ('章', '节', '部分', '引言', '结论', '摘要', '背景', '方法', '结果'),
+    LANG_AR: ('فصل', 'قسم', 'جزء', 'مقدمة', 'خاتمة', 'ملخص', 'خلفية', 'طريقة'),
+    LANG_HI: ('अध्याय', 'खंड', 'भाग', 'परिचय', 'निष्कर्ष', 'सारांश', 'पृष्ठभूमि'),
+}
+
+
+def _build_keyword_search(keywords: Tuple[str, ...]) -> Callable[[str], bool]:
+    """Return a function telling whether any of the keywords occurs in a text.
+    
+    Uses an Aho-Corasick automaton (one linear scan for all keywords) when
+    pyahocorasick is installed, otherwise a single compiled alternation.
+    """
+    if AHOCORASICK_AVAILABLE:
+        automaton = ahocorasick.Automaton()
+        for keyword in keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return lambda text: next(automaton.iter(text), None) is not None
+    
+    pattern = re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+    return lambda text: pattern.search(text) is not None
+
+
+_KEYWORD_SEARCH_BY_LANG = {lang: _build_keyword_search(keywords)
+                           for lang, keywords in _KEYWORDS_BY_LANG.items()}
+
+
+class LanguageProfile(NamedTuple):
+    """Language-specific heading matchers, looked up once per document."""
+    heading_pattern: "re.Pattern"
+    keyword_search: Callable[[str], bool]
+    latin_script: bool
+
+
+_LANGUAGE_PROFILES = {
+    lang: LanguageProfile(_HEADING_PATTERN_RE_BY_LANG[lang], _KEYWORD_SEARCH_BY_LANG[lang], lang in _LATIN_LANGS)
+    for lang in range(len(LANGUAGE_CODES))
+}
+
+# Longest line that can still be a title or heading (see EnhancedTextBlock.is_short_text)
+_MAX_HEADING_LENGTH = 120
+
+# Font names that mark a span as bold-ish
+_BOLD_FONT_RE = re.compile(r'bold|black|heavy|medium', re.IGNORECASE)
+
+# Non-bold lines below this fraction of their page's median font size are not heading candidates
+_SMALL_FONT_RATIO = 0.95
+
+# Number of leading lines sampled for language detection
+_LANGUAGE_SAMPLE_LINES = 50
+
+# Function words for settling ASCII-only samples as English without langdetect.
+# The non-English set holds function words of other Latin-script languages that are
+# not also English words (so no "die", "do", "no", "per" or "in"); any of them is
+# evidence against English, and such samples are left to langdetect.
+_ENGLISH_STOPWORDS = frozenset((
+    'the', 'of', 'and', 'to', 'is', 'for', 'on', 'with', 'that', 'by', 'this', 'are',
+    'from', 'as', 'be', 'was', 'it', 'or',
+))
+_NON_ENGLISH_STOPWORDS = frozenset((
+    # Spanish and Catalan
+    'el', 'els', 'los', 'las', 'del', 'y', 'por', 'para', 'con', 'amb', 'una', 'es',
+    'se', 'al', 'lo', 'como', 'su', 'sus', 'la',
+    # French
+    'le', 'les', 'des', 'du', 'et', 'est', 'pour', 'dans', 'sur', 'au', 'aux', 'ce',
+    'qui', 'ne', 'pas', 'avec',
+    # German
+    'der', 'das', 'und', 'den', 'dem', 'ist', 'mit', 'von', 'zu', 'im', 'auf', 'nicht',
+    'ein', 'eine', 'sich',
+    # Italian
+    'il', 'di', 'che', 'della', 'delle', 'dei', 'degli', 'sono', 'nel', 'nella', 'alla',
+    'gli', 'anche', 'questo', 'questa',
+    # Portuguese
+    'da', 'dos', 'das', 'em', 'na', 'os', 'um', 'uma', 'com', 'nao', 'ao', 'pelo', 'pela',
+    'mais', 'seu', 'sua',
+    # Dutch
+    'het', 'een', 'van', 'voor', 'niet', 'zijn', 'wordt', 'ook', 'bij', 'naar', 'deze',
+    'maar', 'worden', 'dat', 'op', 'te', 'en', 'de',
+))
+_ASCII_WORD_RE = re.compile(r'[a-z]+')
+# A sample is English only with this many English function words and at least
+# twice as many of them as non-English ones
+_MIN_STOPWORD_HITS = 5
+
+# On-disk cache of detected languages, keyed by a hash of the PDF's first bytes and its size.
+# Off unless an extractor is given a path; process_pdfs.py uses this one inside the container.
+LANGUAGE_CACHE_PATH = "/app/cache/lang.json"
+_LANGUAGE_CACHE_KEY_BYTES = 65536
+
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first; equal scores keep their input order."""
+    if len(scores) > k:
+        # O(N) selection of the cutoff score instead of sorting every candidate
+        cutoff = np.partition(scores, len(scores) - k)[len(scores) - k]
+        above = np.flatnonzero(scores > cutoff)
+        ties = np.flatnonzero(scores == cutoff)[:k - len(above)]
+        indices = np.sort(np.concatenate((above, ties)))
+    else:
+        indices = np.arange(len(scores))
+    return indices[np.argsort(-scores[indices], kind="stable")]
+
+
+# Character class codes produced by _CHAR_CLASSES
+_CLASS_UPPER, _CLASS_LOWER, _CLASS_DIGIT, _CLASS_OTHER = '1', '2', '4', '0'
+
+
+class _CharClassTable(dict):
+    """str.translate table mapping each character to a one-letter class code.
+    
+    Entries are computed on first sight of a code point and cached, so every
+    later lookup for that character stays inside the C translate loop.
+    """
+    
+    def __missing__(self, codepoint: int) -> str:
+        char = chr(codepoint)
+        if char.isupper():
+            char_class = _CLASS_UPPER
+        elif char.islower():
+            char_class = _CLASS_LOWER
+        elif char.isdigit():
+            char_class = _CLASS_DIGIT
+        else:
+            char_class = _CLASS_OTHER
+        self[codepoint] = char_class
+        return char_class
+
+
+_CHAR_CLASSES = _CharClassTable()
+for _codepoint in range(128):  # ASCII is pre-filled
+    _CHAR_CLASSES.__missing__(_codepoint)
+del _codepoint
+
+
+def _is_title_case(text: str, latin_script: bool) -> bool:
+    """Enhanced title case detection with multilingual support."""
+    if not text:
+        return False
+    
+    # Check for all caps
+    if text.isupper() and len(text) > 2:
+        return True
+    
+    # For non-Latin scripts, check for mixed case patterns
+    if not latin_script:
+        # For languages like Japanese, Chinese, Arabic, etc.
+        # Check if text has mixed character types (indicating title-like formatting)
+        if len(text) <= 50:
+            # One C-level translate pass classifies every character at once
+            classes = text.translate(_CHAR_CLASSES)
+            has_upper = _CLASS_UPPER in classes
+            has_digit = _CLASS_DIGIT in classes
+            
+            # If it has mixed character types and is short, likely a heading
+            if has_upper or has_digit:
+                return True
+    
+    # Check for title case (first letter of each word capitalized)
+    words = text.split()[:5]  # Check first 5 words
+    if not words:
+        return False
+    
+    # First word should be capitalized
+    if not words[0] or not words[0][0].isupper():
+        return False
+    
+    # At least 60% of words should be capitalized
+    capitalized_words = sum(1 for word in words if word and word[0].isupper())
+    return capitalized_words >= len(words) * 0.6
+
+
+def _has_heading_pattern(text: str, heading_pattern: "re.Pattern") -> bool:
+    """Enhanced heading pattern detection with multilingual support."""
+    return heading_pattern.match(text) is not None
+
+
+def _has_heading_keywords(text: str, keyword_search: Callable[[str], bool]) -> bool:
+    """Check for heading-specific keywords with multilingual support."""
+    return keyword_search(text.lower())
+
+
+def _is_clearly_english(text: str) -> bool:
+    """Whether an ASCII-only sample is clearly English, judged by function words.
+    
+    Anything else, including Spanish, French and German, is left to langdetect.
+    """
+    english_hits = other_hits = 0
+    for word in _ASCII_WORD_RE.findall(text.lower()):
+        if word in _ENGLISH_STOPWORDS:
+            english_hits += 1
+        elif word in _NON_ENGLISH_STOPWORDS:
+            other_hits += 1
+    return english_hits >= _MIN_STOPWORD_HITS and english_hits >= 2 * other_hits
+
+
+@functools.lru_cache(maxsize=1024)
+def _detect_language_cached(sample_text: str) -> int:
+    """Run langdetect on a sample; identical samples are answered from the cache."""
+    try:
+        return _LANGDETECT_CODES.get(detect(sample_text), LANG_EN)
+    except Exception:
+        return LANG_EN
+
+
+def _is_short_text(text: str) -> bool:
+    """Check if text is appropriate length for heading."""
+    return 2 <= len(text) <= _MAX_HEADING_LENGTH  # More lenient length
+
+
+@dataclass(slots=True)
 class EnhancedTextBlock:
-    """Enhanced text block with better heading detection and multilingual support."""
+    """Enhanced text block with better heading detection and multilingual support.
+    
+    Used as a per-row view of a TextBlockTable.
+    """
     text: str
     font_size: float
     is_bold: bool
@@ -54,7 +357,7 @@ class EnhancedTextBlock:
     y0: float
     page_num: int
     font_name: str = ""
-    language: str = "en"  # Default to English
+    language: int = LANG_EN  # Default to English
     
     @property
     def is_centered(self) -> bool:
@@ -69,174 +372,204 @@ class EnhancedTextBlock:
     @property
     def is_title_case(self) -> bool:
         """Enhanced title case detection with multilingual support."""
-        if not self.text.strip():
-            return False
-        text = self.text.strip()
-        
-        # Check for all caps
-        if text.isupper() and len(text) > 2:
-            return True
-        
-        # For non-Latin scripts, check for mixed case patterns
-        if self.language not in ['en', 'es', 'fr', 'de', 'it', 'pt']:
-            # For languages like Japanese, Chinese, Arabic, etc.
-            # Check if text has mixed character types (indicating title-like formatting)
-            has_upper = any(c.isupper() for c in text)
-            has_lower = any(c.islower() for c in text)
-            has_digit = any(c.isdigit() for c in text)
-            
-            # If it has mixed character types and is short, likely a heading
-            if (has_upper or has_digit) and len(text) <= 50:
-                return True
-        
-        # Check for title case (first letter of each word capitalized)
-        words = text.split()[:5]  # Check first 5 words
-        if not words:
-            return False
-        
-        # First word should be capitalized
-        if not words[0] or not words[0][0].isupper():
-            return False
-        
-        # At least 60% of words should be capitalized
-        capitalized_words = sum(1 for word in words if word and word[0].isupper())
-        return capitalized_words >= len(words) * 0.6
+        return _is_title_case(self.text.strip(), self.language in _LATIN_LANGS)
     
     @property
     def has_heading_pattern(self) -> bool:
         """Enhanced heading pattern detection with multilingual support."""
-        text = self.text.strip()
-        
-        # Multilingual numbered patterns
-        numbered_patterns = [
-            r'^\d+\.',  # 1. 2. 3.
-            r'^\d+\)',  # 1) 2) 3)
-            r'^[IVX]+\.',  # I. II. III.
-            r'^[a-z]\)',  # a) b) c)
-            r'^[A-Z]\.',  # A. B. C.
-            # Japanese patterns
-            r'^第\d+章',  # Chapter 1, Chapter 2
-            r'^第\d+節',  # Section 1, Section 2
-            # Chinese patterns
-            r'^第\d+章',  # Chapter 1, Chapter 2
-            r'^第\d+节',  # Section 1, Section 2
-            # Arabic patterns
-            r'^الفصل\s+\d+',  # Chapter
-            r'^القسم\s+\d+',  # Section
-            # Hindi patterns
-            r'^अध्याय\s+\d+',  # Chapter
-            r'^खंड\s+\d+',    # Section
-        ]
-        
-        # Multilingual text patterns
-        text_patterns = {
-            'en': ['Chapter', 'Section', 'Part', 'Introduction', 'Conclusion',
-                   'Abstract', 'Summary', 'Overview', 'Background', 'Method',
-                   'Results', 'Discussion', 'References', 'Appendix'],
-            'es': ['Capítulo', 'Sección', 'Parte', 'Introducción', 'Conclusión',
-                   'Resumen', 'Antecedentes', 'Método', 'Resultados', 'Discusión'],
-            'fr': ['Chapitre', 'Section', 'Partie', 'Introduction', 'Conclusion',
-                   'Résumé', 'Contexte', 'Méthode', 'Résultats', 'Discussion'],
-            'de': ['Kapitel', 'Abschnitt', 'Teil', 'Einleitung', 'Schlussfolgerung',
-                   'Zusammenfassung', 'Hintergrund', 'Methode', 'Ergebnisse'],
-            'ja': ['章', '節', '部', '序論', '結論', '要約', '背景', '方法', '結果'],
-            'zh': ['章', '节', '部分', '引言', '结论', '摘要', '背景', '方法', '结果'],
-            'ar': ['فصل', 'قسم', 'جزء', 'مقدمة', 'خاتمة', 'ملخص', 'خلفية', 'طريقة'],
-            'hi': ['अध्याय', 'खंड', 'भाग', 'परिचय', 'निष्कर्ष', 'सारांश', 'पृष्ठभूमि'],
-        }
-        
-        # Check numbered patterns
-        for pattern in numbered_patterns:
-            if re.match(pattern, text):
-                return True
-        
-        # Check text patterns for detected language
-        patterns = text_patterns.get(self.language, text_patterns['en'])
-        for pattern in patterns:
-            if text.startswith(pattern):
-                return True
-        
-        return False
+        return _has_heading_pattern(self.text.strip(), _HEADING_PATTERN_RE_BY_LANG[self.language])
     
     @property
     def is_short_text(self) -> bool:
         """Check if text is appropriate length for heading."""
-        length = len(self.text.strip())
-        return 2 <= length <= 120  # More lenient length
+        return _is_short_text(self.text.strip())
     
     @property
     def has_heading_keywords(self) -> bool:
         """Check for heading-specific keywords with multilingual support."""
-        text = self.text.strip().lower()
-        
-        # Multilingual keywords
-        keywords = {
-            'en': ['chapter', 'section', 'part', 'introduction', 'conclusion',
-                   'abstract', 'summary', 'overview', 'background', 'method',
-                   'results', 'discussion', 'references', 'appendix', 'analysis',
-                   'evaluation', 'assessment', 'review', 'study', 'research',
-                   'implementation', 'design', 'development', 'testing'],
-            'es': ['capítulo', 'sección', 'parte', 'introducción', 'conclusión',
-                   'resumen', 'antecedentes', 'método', 'resultados', 'discusión'],
-            'fr': ['chapitre', 'section', 'partie', 'introduction', 'conclusion',
-                   'résumé', 'contexte', 'méthode', 'résultats', 'discussion'],
-            'de': ['kapitel', 'abschnitt', 'teil', 'einleitung', 'schlussfolgerung',
-                   'zusammenfassung', 'hintergrund', 'methode', 'ergebnisse'],
-            'ja': ['章', '節', '部', '序論', '結論', '要約', '背景', '方法', '結果'],
-            'zh': ['章', '节', '部分', '引言', '结论', '摘要', '背景', '方法', '结果'],
-            'ar': ['فصل', 'قسم', 'جزء', 'مقدمة', 'خاتمة', 'ملخص', 'خلفية', 'طريقة'],
-            'hi': ['अध्याय', 'खंड', 'भाग', 'परिचय', 'निष्कर्ष', 'सारांश', 'पृष्ठभूमि'],
-        }
-        
-        lang_keywords = keywords.get(self.language, keywords['en'])
-        return any(keyword in text for keyword in lang_keywords)
+        return _has_heading_keywords(self.text.strip(), _KEYWORD_SEARCH_BY_LANG[self.language])
+
+
+class TextBlockTable:
+    """Columnar storage for extracted text lines: one NumPy array per numeric field.
+    
+    Texts are stored already stripped. Row order is extraction (reading) order.
+    """
+    
+    __slots__ = ("texts", "font_names", "font_sizes", "is_bold", "x0", "y0", "page_num", "language")
+    
+    def __init__(self, texts: List[str], font_names: List[str], font_sizes: np.ndarray,
+                 is_bold: np.ndarray, x0: np.ndarray, y0: np.ndarray, page_num: np.ndarray,
+                 language: int = LANG_EN):
+        self.texts = texts
+        self.font_names = font_names
+        self.font_sizes = font_sizes
+        self.is_bold = is_bold
+        self.x0 = x0
+        self.y0 = y0
+        self.page_num = page_num
+        self.language = language
+    
+    @classmethod
+    def from_rows(cls, rows: List[Tuple[str, str, float, bool, float, float, int]]) -> "TextBlockTable":
+        """Build a table from (text, font_name, font_size, is_bold, x0, y0, page_num) tuples."""
+        if not rows:
+            return cls([], [], np.empty(0, dtype=np.float64), np.empty(0, dtype=np.bool_),
+                       np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64),
+                       np.empty(0, dtype=np.int32))
+        texts, font_names, font_sizes, is_bold, x0, y0, page_num = zip(*rows)
+        return cls(
+            list(texts),
+            list(font_names),
+            np.array(font_sizes, dtype=np.float64),
+            np.array(is_bold, dtype=np.bool_),
+            np.array(x0, dtype=np.float64),
+            np.array(y0, dtype=np.float64),
+            np.array(page_num, dtype=np.int32),
+        )
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def block(self, row: int) -> EnhancedTextBlock:
+        """Materialize a single row as an EnhancedTextBlock."""
+        return EnhancedTextBlock(
+            text=self.texts[row],
+            font_size=float(self.font_sizes[row]),
+            is_bold=bool(self.is_bold[row]),
+            x0=float(self.x0[row]),
+            y0=float(self.y0[row]),
+            page_num=int(self.page_num[row]),
+            font_name=self.font_names[row],
+            language=self.language,
+        )
+
+
+class OpenedPDF(NamedTuple):
+    """A PDF read into memory once and opened with PyMuPDF."""
+    data: bytes  # raw file contents
+    doc: "fitz.Document"
+
+
+class ExtractedLines(NamedTuple):
+    """Lines extracted from a document."""
+    table: TextBlockTable  # lines that can still become a title or heading
+    skipped_font_sizes: List[float]  # font sizes of lines that are not heading candidates
+    leading_texts: List[str]  # text of the first lines, for language detection
+
+
+class FontStats(NamedTuple):
+    """Font size statistics of one document, used as heading thresholds."""
+    avg: float
+    p25: float
+    p75: float
+    very_large: float
+
+
+# Thresholds used when a document has no usable font sizes
+DEFAULT_FONT_STATS = FontStats(avg=12.0, p25=12.0, p75=14.0, very_large=18.0)
 
 
 class ImprovedPDFExtractor:
-    """Improved PDF structure extractor with better heading detection and multilingual support."""
+    """Improved PDF structure extractor with better heading detection and multilingual support.
+    
+    Holds no per-document state: font statistics and the document language are
+    passed explicitly through the pipeline, so one instance can process any
+    number of PDFs (including in pre-warmed worker processes).
+    """
     
-    def __init__(self):
-        self.avg_font_size = 12.0
-        self.font_size_thresholds = {}
-        self.document_language = "en"  # Default language
+    __slots__ = ("language_cache_path", "_language_cache")
+    
+    def __init__(self, language_cache_path: Optional[str] = None):
+        self.language_cache_path = language_cache_path
+        self._language_cache = self._load_language_cache()
 
-    def detect_language(self, text: str) -> str:
+    def detect_language(self, text: str) -> int:
         """Detect the language of the given text."""
         if not LANGDETECT_AVAILABLE or not text.strip():
-            return "en"
+            return LANG_EN
+        
+        # Use a sample of the text for language detection
+        sample_text = text[:1000] if len(text) > 1000 else text
+        return _detect_language_cached(sample_text)
+
+    def _load_language_cache(self) -> Dict[str, str]:
+        """Load the on-disk language cache; a missing or unreadable cache is empty.
         
+        Entries whose value is not a known language code are dropped, so a damaged
+        cache only costs a fresh detection.
+        """
+        if not self.language_cache_path:
+            return {}
         try:
-            # Use a sample of the text for language detection
-            sample_text = text[:1000] if len(text) > 1000 else text
-            detected_lang = detect(sample_text)
-            
-            # Map language codes to our supported languages
-            lang_mapping = {
-                'en': 'en', 'es': 'es', 'fr': 'fr', 'de': 'de',
-                'ja': 'ja', 'zh': 'zh', 'ar': 'ar', 'hi': 'hi',
-                'zh-cn': 'zh', 'zh-tw': 'zh', 'zh-hans': 'zh', 'zh-hant': 'zh'
-            }
-            
-            return lang_mapping.get(detected_lang, 'en')
-        except Exception:
-            return "en"
+            with open(self.language_cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(cache, dict):
+            return {}
+        return {key: code for key, code in cache.items()
+                if isinstance(code, str) and code in _LANGDETECT_CODES}
+
+    def _save_language_cache(self) -> None:
+        """Merge this extractor's entries into the on-disk cache (best effort).
+        
+        The load-merge-replace is not locked: when worker processes save at the same
+        time, the last replace wins and the other's new entries are lost. That only
+        means those PDFs are detected again on a later run.
+        """
+        if not self.language_cache_path:
+            return
+        try:
+            cache = self._load_language_cache()
+            cache.update(self._language_cache)
+            os.makedirs(os.path.dirname(self.language_cache_path) or ".", exist_ok=True)
+            # Write-then-rename so concurrent worker processes never see a partial file
+            tmp_path = f"{self.language_cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.language_cache_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _language_cache_key(pdf_path: str, data: Optional[bytes] = None) -> Optional[str]:
+        """Cache key for a PDF: hash of its first 64 KiB plus its size in bytes.
+        
+        Uses the file contents when they are already in memory, and reads the file otherwise.
+        """
+        if data is not None:
+            head, size = memoryview(data)[:_LANGUAGE_CACHE_KEY_BYTES], len(data)
+        else:
+            try:
+                with open(pdf_path, 'rb') as f:
+                    head = f.read(_LANGUAGE_CACHE_KEY_BYTES)
+                size = os.path.getsize(pdf_path)
+            except OSError:
+                return None
+        return f"{hashlib.blake2b(head, digest_size=8).hexdigest()}-{size}"
 
-    def detect_document_language(self, text_blocks: List[EnhancedTextBlock]) -> str:
+    def detect_document_language(self, leading_texts: List[str]) -> int:
         """Detect the primary language of the document."""
-        if not text_blocks:
-            return "en"
+        if not leading_texts:
+            return LANG_EN
         
         # Collect text from the first few pages for language detection
         sample_texts = []
-        for block in text_blocks[:50]:  # Use first 50 blocks
-            if len(block.text.strip()) > 10:  # Only use substantial text
-                sample_texts.append(block.text)
+        for text in leading_texts[:_LANGUAGE_SAMPLE_LINES]:  # Use first 50 lines
+            if len(text.strip()) > 10:  # Only use substantial text
+                sample_texts.append(text)
         
         if not sample_texts:
-            return "en"
+            return LANG_EN
         
         # Combine sample texts and detect language
         combined_text = " ".join(sample_texts)
+        
+        # Most documents are plain English; settle those without running langdetect
+        if combined_text.isascii() and _is_clearly_english(combined_text):
+            return LANG_EN
+        
         return self.detect_language(combined_text)
 
     # ---------------------------
@@ -246,14 +579,15 @@ class ImprovedPDFExtractor:
     def build_hierarchy(flat_headings: List[Dict]) -> List[Dict]:
         """Convert a flat, page-ordered heading list to a nested outline.
 
-        Each node → {"title": str, "page": int, "children": []}
+        Each node → {"title": str, "page": int}; "children" is only added
+        once a node has at least one child.
         """
         outline: List[Dict] = []
         stack: List[Dict] = []  # track latest node at each level
 
         for h in flat_headings:
             level = int(h["level"][1])  # "H1" -> 1, etc.
-            node = {"title": h["text"], "page": h["page"], "children": []}
+            node = {"title": h["text"], "page": h["page"]}
 
             # Ensure stack depth matches (level-1)
             while len(stack) >= level:
@@ -261,7 +595,7 @@ class ImprovedPDFExtractor:
 
             if stack:
                 # attach as child of previous level
-                stack[-1]["children"].append(node)
+                stack[-1].setdefault("children", []).append(node)
             else:
                 outline.append(node)
 
@@ -269,82 +603,166 @@ class ImprovedPDFExtractor:
 
         return outline
     
-    def extract_text_blocks_enhanced(self, pdf_path: str) -> List[EnhancedTextBlock]:
-        """Extract text blocks with enhanced analysis."""
+    @staticmethod
+    def open_document(pdf_path: str) -> Optional[OpenedPDF]:
+        """Read a PDF into memory once and open it with PyMuPDF; None if it cannot be opened."""
+        try:
+            with open(pdf_path, 'rb') as file:
+                data = file.read()
+            return OpenedPDF(data, fitz.open(stream=data, filetype="pdf"))
+        except Exception as e:
+            print(f"PyMuPDF error: {e}")
+            return None
+    
+    def extract_text_blocks_enhanced(self, pdf_path: str, pdf: Optional[OpenedPDF] = None) -> ExtractedLines:
+        """Extract text blocks with enhanced analysis.
+        
+        Uses the already opened `pdf` when given; otherwise the file is opened
+        here and closed again before returning.
+        """
+        data = None
         if PDF_LIBRARY == "PyMuPDF":
-            text_blocks = self._extract_with_pymupdf(pdf_path)
+            if pdf is not None:
+                extracted = self._extract_with_pymupdf(pdf.doc)
+            else:
+                pdf = self.open_document(pdf_path)
+                try:
+                    extracted = self._extract_with_pymupdf(pdf.doc if pdf is not None else None)
+                finally:
+                    if pdf is not None:
+                        pdf.doc.close()
+            data = pdf.data if pdf is not None else None
         else:
-            text_blocks = self._extract_with_pypdf2(pdf_path)
+            extracted = self._extract_with_pypdf2(pdf_path)
         
-        if not text_blocks:
-            return []
+        if not len(extracted.table) and not extracted.skipped_font_sizes:
+            return extracted
         
-        # Detect document language first
-        self.document_language = self.detect_document_language(text_blocks)
-        print(f"Detected document language: {self.document_language}")
+        # Detect document language first (reruns on the same file are answered from the cache)
+        cache_key = self._language_cache_key(pdf_path, data) if self.language_cache_path else None
+        cached_code = self._language_cache.get(cache_key) if cache_key else None
+        if cached_code in _LANGDETECT_CODES:
+            language = _LANGDETECT_CODES[cached_code]
+        else:
+            language = self.detect_document_language(extracted.leading_texts)
+            # Without langdetect the answer may just be the English fallback; don't persist it
+            if cache_key and LANGDETECT_AVAILABLE:
+                self._language_cache[cache_key] = LANGUAGE_CODES[language]
+                self._save_language_cache()
+        print(f"Detected document language: {LANGUAGE_CODES[language]}")
         
         # Assign language to all text blocks
-        for block in text_blocks:
-            block.language = self.document_language
+        extracted.table.language = language
         
-        return text_blocks
+        return extracted
     
-    def _extract_with_pymupdf(self, pdf_path: str) -> List[EnhancedTextBlock]:
+    def _extract_with_pymupdf(self, doc: Optional["fitz.Document"]) -> ExtractedLines:
         """Extract using PyMuPDF with enhanced analysis."""
-        text_blocks = []
+        rows = []
+        skipped_font_sizes = []
+        leading_texts = []
+        
+        if doc is None:
+            return ExtractedLines(TextBlockTable.from_rows(rows), skipped_font_sizes, leading_texts)
         
         try:
-            doc = fitz.open(pdf_path)
-            
             for page_num in range(min(len(doc), 50)):
-                page = doc[page_num]
-                
-                # Get text blocks with detailed font info
-                blocks = page.get_text("dict")["blocks"]
-
-                for block in blocks:
-                    for line in block.get("lines", []):
-                        spans_in_line = line.get("spans", [])
-                        if not spans_in_line:
-                            continue
-
-                        # Combine all spans on this line into one text string to avoid heading splits
-                        combined_text = "".join(s["text"] for s in spans_in_line).strip()
-                        if not combined_text or len(combined_text) < 2:
-                            continue
-
-                        # Representative font size = max span size on the line (captures heading size)
-                        largest_span = max(spans_in_line, key=lambda sp: sp["size"])
-                        font_size = largest_span["size"]
-
-                        # Bold if any span is bold-ish
-                        any_bold = any(any(ind in s["font"].lower() for ind in ["bold", "black", "heavy", "medium"]) for s in spans_in_line)
-
-                        x0 = min(s["bbox"][0] for s in spans_in_line)
-                        y0 = min(s["bbox"][1] for s in spans_in_line)
-
-                        text_block = EnhancedTextBlock(
-                            text=combined_text,
-                            font_size=font_size,
-                            is_bold=any_bold,
-                            x0=x0,
-                            y0=y0,
-                            page_num=page_num + 1,
-                            font_name=largest_span["font"]
-                        )
-
-                        text_blocks.append(text_block)
-            
-            doc.close()
+                page_rows, page_skipped, page_leading = self._parse_page(doc[page_num], page_num)
+                rows.extend(page_rows)
+                skipped_font_sizes.extend(page_skipped)
+                if len(leading_texts) < _LANGUAGE_SAMPLE_LINES:
+                    leading_texts.extend(page_leading)
         
         except Exception as e:
             print(f"PyMuPDF error: {e}")
         
-        return text_blocks
+        rows = self._drop_small_lines(rows, skipped_font_sizes)
+        return ExtractedLines(TextBlockTable.from_rows(rows), skipped_font_sizes,
+                              leading_texts[:_LANGUAGE_SAMPLE_LINES])
+    
+    def _parse_page(self, page, page_num: int) -> Tuple[List[Tuple], List[float], List[str]]:
+        """Build one table row per line of a PyMuPDF page.
+        
+        Returns (rows, skipped font sizes, leading texts).
+        """
+        rows = []
+        skipped_font_sizes = []
+        leading_texts = []
+        
+        # Get text blocks with detailed font info (text only, no image payloads)
+        blocks = page.get_textpage(flags=TEXT_FLAGS).extractDICT()["blocks"]
+
+        for block in blocks:
+            for line in block.get("lines", []):
+                spans_in_line = line.get("spans", [])
+                if not spans_in_line:
+                    continue
+
+                # One pass over the spans collects everything the line needs:
+                # - text of all spans, combined to avoid heading splits
+                # - representative font size = max span size (captures heading size)
+                # - bold if any span is bold-ish
+                # - top-left corner of the line
+                span_texts = []
+                largest_span = None
+                font_size = float("-inf")
+                any_bold = False
+                x0 = y0 = float("inf")
+                for span in spans_in_line:
+                    span_texts.append(span["text"])
+                    size = span["size"]
+                    if size > font_size:
+                        font_size = size
+                        largest_span = span
+                    if not any_bold and _BOLD_FONT_RE.search(span["font"]):
+                        any_bold = True
+                    bbox = span["bbox"]
+                    if bbox[0] < x0:
+                        x0 = bbox[0]
+                    if bbox[1] < y0:
+                        y0 = bbox[1]
+
+                combined_text = "".join(span_texts).strip()
+                if not combined_text or len(combined_text) < 2:
+                    continue
+
+                if len(leading_texts) < _LANGUAGE_SAMPLE_LINES:
+                    leading_texts.append(combined_text)
+
+                # Lines this long can never be a title or heading; they only feed font statistics
+                if len(combined_text) > _MAX_HEADING_LENGTH:
+                    skipped_font_sizes.append(font_size)
+                    continue
+
+                rows.append((combined_text, largest_span["font"], font_size, any_bold, x0, y0, page_num + 1))
+        
+        return rows, skipped_font_sizes, leading_texts
+    
+    @staticmethod
+    def _drop_small_lines(rows: List[Tuple], skipped_font_sizes: List[float]) -> List[Tuple]:
+        """Keep the rows that can still be headings; move the others' font sizes to skipped_font_sizes.
+        
+        Non-bold lines set smaller than the document's body text (footnotes, captions,
+        running headers) are not heading candidates. The median is taken over the whole
+        document, not per page: on a sparse cover page the title alone would set the
+        median and push out subtitles.
+        """
+        if not rows:
+            return rows
+        min_font_size = _SMALL_FONT_RATIO * statistics.median(
+            [row[2] for row in rows] + skipped_font_sizes
+        )
+        candidate_rows = []
+        for row in rows:
+            if row[3] or row[2] >= min_font_size:
+                candidate_rows.append(row)
+            else:
+                skipped_font_sizes.append(row[2])
+        return candidate_rows
     
-    def _extract_with_pypdf2(self, pdf_path: str) -> List[EnhancedTextBlock]:
+    def _extract_with_pypdf2(self, pdf_path: str) -> ExtractedLines:
         """Extract using PyPDF2 with basic analysis."""
-        text_blocks = []
+        rows = []
         
         try:
             with open(pdf_path, 'rb') as file:
@@ -359,174 +777,138 @@ class ImprovedPDFExtractor:
                         for line in lines:
                             line = line.strip()
                             if line and len(line) >= 2:
-                                # Basic analysis for PyPDF2
-                                text_block = EnhancedTextBlock(
-                                    text=line,
-                                    font_size=12.0,  # Default size
-                                    is_bold=False,   # Can't detect with PyPDF2
-                                    x0=0.0,          # Can't detect with PyPDF2
-                                    y0=0.0,          # Can't detect with PyPDF2
-                                    page_num=page_num + 1
-                                )
-                                text_blocks.append(text_block)
+                                # Basic analysis for PyPDF2: default size, no bold or position info
+                                rows.append((line, "", 12.0, False, 0.0, 0.0, page_num + 1))
         
         except Exception as e:
             print(f"PyPDF2 error: {e}")
         
-        return text_blocks
+        leading_texts = [row[0] for row in rows[:_LANGUAGE_SAMPLE_LINES]]
+        return ExtractedLines(TextBlockTable.from_rows(rows), [], leading_texts)
     
-    def calculate_font_statistics(self, text_blocks: List[EnhancedTextBlock]) -> None:
+    @staticmethod
+    def calculate_font_statistics(table: TextBlockTable,
+                                  skipped_font_sizes: List[float] = ()) -> FontStats:
         """Calculate font size statistics for better heading detection."""
-        if not text_blocks:
-            return
+        if not len(table) and not skipped_font_sizes:
+            return DEFAULT_FONT_STATS
         
-        # Get font sizes
-        font_sizes = [block.font_size for block in text_blocks if block.font_size > 0]
-        if not font_sizes:
-            return
-        
-        # Calculate statistics
-        font_sizes.sort()
-        self.avg_font_size = sum(font_sizes) / len(font_sizes)
-        
-        # Calculate percentiles for better thresholds
-        p25 = font_sizes[len(font_sizes) // 4]
-        p75 = font_sizes[3 * len(font_sizes) // 4]
+        # Get font sizes (including lines dropped during extraction)
+        font_sizes = np.concatenate((table.font_sizes, np.asarray(skipped_font_sizes, dtype=np.float64)))
+        font_sizes = font_sizes[font_sizes > 0]
+        if not len(font_sizes):
+            return DEFAULT_FONT_STATS
         
-        self.font_size_thresholds = {
-            'small': p25,
-            'medium': self.avg_font_size,
-            'large': p75,
-            'very_large': p75 * 1.5
-        }
+        # Calculate average and percentiles for better thresholds
+        avg, p25, p75 = font_stats(font_sizes)
+        return FontStats(avg=float(avg), p25=float(p25), p75=float(p75), very_large=float(p75) * 1.5)
     
-    def extract_title_enhanced(self, pdf_path: str, text_blocks: List[EnhancedTextBlock]) -> str:
+    @staticmethod
+    def extract_title_enhanced(doc: Optional["fitz.Document"], table: TextBlockTable,
+                               stats: FontStats) -> str:
         """Enhanced title extraction."""
         # Try metadata first
-        if PDF_LIBRARY == "PyMuPDF":
+        if doc is not None:
             try:
-                doc = fitz.open(pdf_path)
                 title = doc.metadata.get('title', '').strip()
-                doc.close()
                 if title and len(title) > 3:
                     return title
             except:
                 pass
         
         # Content-based extraction
-        first_page_blocks = [b for b in text_blocks if b.page_num == 1]
-        if not first_page_blocks:
+        first_page_rows = np.flatnonzero(table.page_num == 1)
+        if not len(first_page_rows):
             return "Untitled Document"
         
-        # Find best title candidate
-        title_candidates = []
-        for block in first_page_blocks:
-            if not block.is_short_text:
-                continue
-            
-            score = 0
-            
-            # Font size scoring
-            if block.font_size >= self.font_size_thresholds.get('very_large', 18):
-                score += 30
-            elif block.font_size >= self.font_size_thresholds.get('large', 14):
-                score += 20
-            elif block.font_size >= self.font_size_thresholds.get('medium', 12):
-                score += 10
-            
-            # Position scoring
-            if block.is_near_top:
-                score += 15
-            if block.is_centered:
-                score += 10
-            
-            # Style scoring
-            if block.is_bold:
-                score += 15
-            
-            # Content scoring
-            if block.is_title_case:
-                score += 20
-            
-            if score >= 25:
-                title_candidates.append((block, score))
+        texts = [table.texts[row] for row in first_page_rows]
+        is_short = np.array([_is_short_text(text) for text in texts], dtype=np.bool_)
         
-        if title_candidates:
-            title_candidates.sort(key=lambda x: x[1], reverse=True)
-            return title_candidates[0][0].text
+        # Font size scoring
+        font_sizes = table.font_sizes[first_page_rows]
+        scores = np.select(
+            [font_sizes >= stats.very_large,
+             font_sizes >= stats.p75,
+             font_sizes >= stats.avg],
+            [30, 20, 10],
+            default=0,
+        )
+        
+        # Position scoring (near top of page, centered)
+        scores += 15 * (table.y0[first_page_rows] < 300)
+        scores += 10 * (np.abs(table.x0[first_page_rows]) < 150)
+        
+        # Style scoring
+        scores += 15 * table.is_bold[first_page_rows]
+        
+        # Content scoring (only evaluated for lines short enough to be a title)
+        latin_script = _LANGUAGE_PROFILES[table.language].latin_script
+        scores += 20 * np.array([short and _is_title_case(text, latin_script)
+                                 for text, short in zip(texts, is_short)], dtype=np.bool_)
+        
+        # Best candidate wins; argmax keeps the first of equal scores
+        scores[~is_short] = -1
+        best = int(np.argmax(scores))
+        if scores[best] >= 25:
+            return texts[best]
         
         return "Untitled Document"
     
-    def identify_headings_enhanced(self, text_blocks: List[EnhancedTextBlock]) -> List[EnhancedTextBlock]:
+    @staticmethod
+    def identify_headings_enhanced(table: TextBlockTable, stats: FontStats) -> List[EnhancedTextBlock]:
         """Enhanced heading identification with multiple strategies."""
-        potential_headings = []
+        candidates = []
         
-        for block in text_blocks:
-            if not block.is_short_text:
+        for row, text in enumerate(table.texts):
+            if not _is_short_text(text):
                 continue
 
             # --- New: Filter out lines ending with punctuation ---
-            if block.text.strip().endswith(('.', '?', '!')):
+            if text.endswith(('.', '?', '!')):
                 continue
 
             # --- New: Require at least 2 words and at least one capitalized word ---
-            words = block.text.strip().split()
+            words = text.split()
             if len(words) < 2:
                 continue
             if not any(w[0].isupper() for w in words if w):
                 continue
 
-            # Multi-factor scoring
-            score = 0
-
-            # Font size scoring (relative to document)
-            if self.avg_font_size > 0:
-                relative_size = block.font_size / self.avg_font_size
-                if relative_size >= 1.5:
-                    score += 35
-                elif relative_size >= 1.3:
-                    score += 30
-                elif relative_size >= 1.1:
-                    score += 25
-                elif relative_size >= 0.9:
-                    score += 15
-                else:
-                    score += 5
-
-            # Style scoring
-            if block.is_bold:
-                score += 25
-
-            # Position scoring
-            if block.is_near_top:
-                score += 15
-            if block.is_centered:
-                score += 15
-
-            # Content scoring
-            if block.is_title_case:
-                score += 20
-            if block.has_heading_pattern:
-                score += 30
-            if block.has_heading_keywords:
-                score += 20
-
-            # Length scoring
-            length = len(block.text.strip())
-            if 5 <= length <= 50:
-                score += 10
-            elif 51 <= length <= 80:
-                score += 5
-
-            # Lower threshold for more headings
-            if score >= 25:
-                potential_headings.append((block, score))
-        
-        # Return top 50 candidates to keep more potential headings
-        potential_headings.sort(key=lambda x: x[1], reverse=True)
-        return [block for block, score in potential_headings[:50]]
-    
-    def assign_levels_enhanced(self, headings: List[EnhancedTextBlock]) -> List[Dict]:
+            candidates.append(row)
+        
+        if not candidates:
+            return []
+        
+        # Multi-factor scoring over column arrays; text features are evaluated once per row
+        rows = np.array(candidates, dtype=np.intp)
+        texts = [table.texts[row] for row in candidates]
+        profile = _LANGUAGE_PROFILES[table.language]
+        scores = score_blocks(
+            font_sizes=table.font_sizes[rows],
+            is_bold=table.is_bold[rows],
+            x0s=table.x0[rows],
+            y0s=table.y0[rows],
+            lengths=np.array([len(text) for text in texts], dtype=np.int64),
+            pattern_flags=np.array([_has_heading_pattern(text, profile.heading_pattern) for text in texts],
+                                   dtype=np.bool_),
+            keyword_flags=np.array([_has_heading_keywords(text, profile.keyword_search) for text in texts],
+                                   dtype=np.bool_),
+            titlecase_flags=np.array([_is_title_case(text, profile.latin_script) for text in texts],
+                                     dtype=np.bool_),
+            avg_font_size=stats.avg,
+        )
+        
+        # Lower threshold for more headings
+        passing = np.flatnonzero(scores >= 25)
+        
+        # Return top 50 candidates to keep more potential headings, in reading order:
+        # page, then vertical position (the stable lexsort keeps ties best-first)
+        top = rows[passing[_top_k_indices(scores[passing], 50)]]
+        top = top[np.lexsort((table.y0[top], table.page_num[top]))]
+        return [table.block(row) for row in top]
+    
+    @staticmethod
+    def assign_levels_enhanced(headings: List[EnhancedTextBlock], stats: FontStats) -> List[Dict]:
         """Enhanced level assignment with better logic."""
         if not headings:
             return []
@@ -535,8 +917,8 @@ class ImprovedPDFExtractor:
         
         for heading in headings:
             # Enhanced level assignment
-            if self.avg_font_size > 0:
-                relative_size = heading.font_size / self.avg_font_size
+            if stats.avg > 0:
+                relative_size = heading.font_size / stats.avg
                 
                 if relative_size >= 1.4:
                     level = "H1"
@@ -558,56 +940,71 @@ class ImprovedPDFExtractor:
             heading_levels.append({
                 "level": level,
                 "text": heading.text.strip(),
-                "page": heading.page_num,
-                "y0": heading.y0  # Keep y0 for proper sorting
+                "page": heading.page_num
             })
         
-        # Sort by page number first, then by vertical position (reading order)
-        heading_levels.sort(key=lambda x: (x["page"], x["y0"]))
-        
-        # Remove y0 from final output
-        for heading in heading_levels:
-            del heading["y0"]
-            
+        # Headings arrive in reading order from identify_headings_enhanced
         return heading_levels
     
     def process_pdf_enhanced(self, pdf_path: str) -> Dict:
         """Enhanced PDF processing with better heading detection and multilingual support."""
         start_time = time.time()
         
+        # Open the document once; text extraction and title metadata share it
+        pdf = None
+        if PDF_LIBRARY == "PyMuPDF":
+            pdf = self.open_document(pdf_path)
+            if pdf is None:
+                return {"title": "Untitled Document", "outline": [], "language": "en"}
+        
         try:
             # Extract text blocks (language detection happens here)
-            text_blocks = self.extract_text_blocks_enhanced(pdf_path)
+            extracted = self.extract_text_blocks_enhanced(pdf_path, pdf)
+            table = extracted.table
             
-            if not text_blocks:
+            if not len(table) and not extracted.skipped_font_sizes:
                 return {"title": "Untitled Document", "outline": [], "language": "en"}
             
             # Calculate font statistics
-            self.calculate_font_statistics(text_blocks)
+            stats = self.calculate_font_statistics(table, extracted.skipped_font_sizes)
 
             # Extract title
-            title = self.extract_title_enhanced(pdf_path, text_blocks)
+            title = self.extract_title_enhanced(pdf.doc if pdf is not None else None, table, stats)
             
             # Identify headings
-            potential_headings = self.identify_headings_enhanced(text_blocks)
+            potential_headings = self.identify_headings_enhanced(table, stats)
             
             # Assign levels
-            headings = self.assign_levels_enhanced(potential_headings)
+            headings = self.assign_levels_enhanced(potential_headings, stats)
 
             # Return flat list format as requested
             processing_time = time.time() - start_time
             print(f"Processing time: {processing_time:.2f} seconds")
-            print(f"Detected language: {self.document_language}")
+            print(f"Detected language: {LANGUAGE_CODES[table.language]}")
             
             return {
                 "title": title,
                 "outline": headings,
-                "language": self.document_language
+                "language": LANGUAGE_CODES[table.language]
             }
             
         except Exception as e:
             print(f"Error processing PDF: {e}")
             return {"title": "Error Processing Document", "outline": [], "language": "en"}
+        
+        finally:
+            if pdf is not None:
+                pdf.doc.close()
+
+
+def write_json_output(output_path: str, result: Dict) -> None:
+    """Write a result as indented UTF-8 JSON, using orjson's C encoder when available."""
+    if ORJSON_AVAILABLE:
+        with open(output_path, 'wb') as f:
+            f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
 
 
 def main():
@@ -646,8 +1043,7 @@ def main():
     
     # Write JSON output
     try:
-        with open(args.output_json, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+        write_json_output(args.output_json, result)
         
         total_time = time.time() - total_start_time
         print(f"Total execution time: {total_time:.2f} seconds")
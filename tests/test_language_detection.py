@@ -0,0 +1,71 @@
+"""
+Tests for the English fast path used before langdetect.
+
+Run from the repository root with: python -m unittest discover tests
+"""
+
+import unittest
+
+from src.main_improved import (
+    LANG_EN, LANG_ES, ImprovedPDFExtractor, _ENGLISH_STOPWORDS, _NON_ENGLISH_STOPWORDS,
+    _is_clearly_english,
+)
+
+
+ENGLISH = (
+    "This document describes the design of the system and the results of the "
+    "evaluation. The first section covers the background, and the second presents "
+    "the method that was used for testing."
+)
+
+NON_ENGLISH = {
+    "es": "Este documento describe el diseno del sistema y los resultados de la evaluacion. "
+          "La primera parte presenta los antecedentes y el metodo que se utilizo para las "
+          "pruebas con una muestra del proyecto.",
+    "fr": "Ce document decrit la conception du systeme et les resultats de l'evaluation. "
+          "La premiere partie presente le contexte et la methode qui est utilisee pour les "
+          "tests dans le cadre du projet.",
+    "de": "Dieses Dokument beschreibt den Entwurf des Systems und die Ergebnisse der "
+          "Auswertung. Der erste Teil stellt den Hintergrund vor und der zweite die Methode, "
+          "die mit dem Projekt verwendet wurde.",
+    "it": "Il progetto si basa su una architettura a livelli. Lo scopo del lavoro e la "
+          "descrizione del sistema con una analisi delle prestazioni al variare del carico.",
+    "it-2": "La relazione descrive lo stato del progetto. Il modulo principale gestisce le "
+            "richieste con una coda e le invia al server.",
+    "ca": "El projecte es basa en una arquitectura per capes. L'objectiu del treball es la "
+          "descripcio del sistema amb una analisi del rendiment.",
+    "pt": "O projeto se baseia em uma arquitetura em camadas. O objetivo do trabalho e a "
+          "descricao do sistema com uma analise do desempenho.",
+    "nl": "Het project is gebaseerd op een gelaagde architectuur. Het doel van het werk is "
+          "de beschrijving van het systeem met een analyse van de prestaties.",
+}
+
+
+class EnglishFastPathTest(unittest.TestCase):
+
+    def test_stopword_sets_are_disjoint(self):
+        self.assertFalse(_ENGLISH_STOPWORDS & _NON_ENGLISH_STOPWORDS)
+
+    def test_english_sample(self):
+        self.assertTrue(_is_clearly_english(ENGLISH))
+
+    def test_short_sample_is_left_to_langdetect(self):
+        self.assertFalse(_is_clearly_english("Introduction Overview Background"))
+
+    def test_other_languages_are_left_to_langdetect(self):
+        for code, text in NON_ENGLISH.items():
+            with self.subTest(code=code):
+                self.assertFalse(_is_clearly_english(text))
+
+    def test_unsupported_languages_are_not_reported_as_spanish(self):
+        extractor = ImprovedPDFExtractor()
+        for code in ("it", "it-2", "pt", "nl"):
+            with self.subTest(code=code):
+                self.assertNotEqual(extractor.detect_document_language([NON_ENGLISH[code]]), LANG_ES)
+
+    def test_english_document(self):
+        self.assertEqual(ImprovedPDFExtractor().detect_document_language([ENGLISH]), LANG_EN)
+
+
+if __name__ == "__main__":
+    unittest.main()